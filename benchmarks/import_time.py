@@ -0,0 +1,89 @@
+"""Вимірює час холодного запуску (імпорту) точок входу редактора.
+
+Кожна точка входу імпортується в окремому процесі Python, тому результат
+включає повний час завантаження модулів. Медіана за кількома запусками
+дописується до output/import_times.csv, щоб відстежувати регресії.
+
+Запуск:  python benchmarks/import_time.py [--runs 10] [--top 10]
+"""
+import argparse
+import csv
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+sys.path.insert(0, SRC_DIR)
+import settings  # noqa: E402
+
+
+# Назва точки входу -> код, який імпортує її
+ENTRY_POINTS = {
+    "gui": "import main",
+    "settings": "import settings",
+    "export": "import compression, shards",
+    "verify": "import verify",
+}
+
+REPORT_PATH = os.path.join(settings.CSV_FOLDER, "import_times.csv")
+
+
+def measure_cold_start(code, runs):
+    """Повертає час (у секундах) кожного із запусків `python -c code` у новому процесі."""
+    timings = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, check=True)
+        timings.append(time.perf_counter() - started_at)
+    return timings
+
+
+def slowest_imports(code, top):
+    """Повертає найповільніші модулі за даними `python -X importtime` (сумарний час, мкс)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIR, check=True, capture_output=True, text=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        modules.append((int(cumulative_us), name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="кількість запусків для кожної точки входу")
+    parser.add_argument("--top", type=int, default=10, help="скільки найповільніших імпортів показати")
+    args = parser.parse_args()
+
+    # Базовий час запуску інтерпретатора віднімаємо від результатів
+    baseline = statistics.median(measure_cold_start("pass", args.runs))
+    print(f"interpreter startup: {baseline * 1000:.1f} ms")
+
+    rows = []
+    for name, code in ENTRY_POINTS.items():
+        median = statistics.median(measure_cold_start(code, args.runs)) - baseline
+        print(f"\n{name:<10} {median * 1000:8.1f} ms  ({code})")
+        for cumulative_us, module in slowest_imports(code, args.top):
+            print(f"    {cumulative_us / 1000:8.1f} ms  {module}")
+        rows.append([time.strftime("%Y-%m-%d %H:%M:%S"), name, f"{median * 1000:.1f}", args.runs])
+
+    os.makedirs(settings.CSV_FOLDER, exist_ok=True)
+    report_exists = os.path.exists(REPORT_PATH)
+    with open(REPORT_PATH, mode='a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        if not report_exists:
+            writer.writerow(['timestamp', 'entry_point', 'median_ms', 'runs'])
+        writer.writerows(rows)
+    print(f"\nResults appended to {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageColor
+
+
+PAGE_BILEVEL = "bilevel"
+PAGE_GRAYSCALE = "grayscale"
+PAGE_COLOR = "color"
+
+# Профілі експорту: який кодек використати для кожного типу сторінки.
+# "bilevel" - 1 біт на піксель, "gray" - 8-бітний відтінок сірого без втрат,
+# "png" - RGB без втрат, "jpeg" - JPEG з якістю jpeg_quality.
+# exact=True - сторінка вважається сірою лише якщо R == G == B для кожного пікселя,
+# тобто профіль ніколи не змінює жодного пікселя.
+EXPORT_PROFILES = {
+    "lossless": {
+        PAGE_BILEVEL: "bilevel",
+        PAGE_GRAYSCALE: "gray",
+        PAGE_COLOR: "png",
+        "jpeg_quality": None,
+        "exact": True,
+    },
+    "balanced": {
+        PAGE_BILEVEL: "bilevel",
+        PAGE_GRAYSCALE: "gray",
+        PAGE_COLOR: "jpeg",
+        "jpeg_quality": 85,
+        "exact": False,
+    },
+    "compact": {
+        PAGE_BILEVEL: "bilevel",
+        PAGE_GRAYSCALE: "jpeg",
+        PAGE_COLOR: "jpeg",
+        "jpeg_quality": 70,
+        "exact": False,
+    },
+    # Попередня поведінка: кожна сторінка як RGB PNG
+    "rgb": {
+        PAGE_BILEVEL: "png",
+        PAGE_GRAYSCALE: "png",
+        PAGE_COLOR: "png",
+        "jpeg_quality": None,
+        "exact": True,
+    },
+}
+
+# Для профілів з exact=False: максимальна різниця між каналами, за якої піксель
+# вважається сірим (шум кольорових сканів), і кількість кольорових пікселів,
+# починаючи з якої сторінка вважається кольоровою
+GRAY_CHANNEL_TOLERANCE = 12
+
+COLOR_PIXEL_LIMIT = 20
+
+# Для профілів з exact=False сторінка вважається бінарною, якщо не менше
+# BILEVEL_PIXEL_SHARE пікселів відхиляються від чорного або білого не більше ніж
+# на BILEVEL_TOLERANCE (згладжені краї накладеного тексту); такі сторінки
+# зводяться до ч/б порогом BILEVEL_THRESHOLD
+BILEVEL_TOLERANCE = 32
+
+BILEVEL_PIXEL_SHARE = 0.99
+
+BILEVEL_THRESHOLD = 128
+
+
+def is_gray_color(color):
+    """Перевіряє, чи колір (#rrggbb або назва Tk/PIL) є відтінком сірого."""
+    red, green, blue = ImageColor.getrgb(color)[:3]
+    return red == green == blue
+
+
+def classify_page(img, exact=False, force_color=False):
+    """Визначає тип сторінки: бінарна (ч/б), відтінки сірого або кольорова.
+
+    З exact=True бінарною вважається лише сторінка, усі пікселі якої чорні (0) або
+    білі (255), тому 1-бітне кодування нічого не втрачає; інакше допускаються майже
+    бінарні сторінки (див. BILEVEL_PIXEL_SHARE). force_color=True - сторінка містить
+    кольорове накладення і завжди кодується як кольорова.
+    Повертає тип сторінки і її растр у відтінках сірого (None для кольорових сторінок).
+    """
+    if force_color:
+        return PAGE_COLOR, None
+
+    pixels = np.asarray(img.convert("RGB"))
+    channel_spread = pixels.max(axis=2) - pixels.min(axis=2)
+    if exact:
+        is_color = np.any(channel_spread)
+    else:
+        is_color = np.count_nonzero(channel_spread > GRAY_CHANNEL_TOLERANCE) > COLOR_PIXEL_LIMIT
+    if is_color:
+        return PAGE_COLOR, None
+
+    gray = pixels.mean(axis=2, dtype=np.float32).round().astype(np.uint8)
+    if exact:
+        is_bilevel = np.all((gray == 0) | (gray == 255))
+    else:
+        extreme = np.count_nonzero((gray <= BILEVEL_TOLERANCE) | (gray >= 255 - BILEVEL_TOLERANCE))
+        is_bilevel = extreme >= BILEVEL_PIXEL_SHARE * gray.size
+    if is_bilevel:
+        return PAGE_BILEVEL, gray
+    return PAGE_GRAYSCALE, gray
+
+
+def encode_page(img, profile, force_color=False):
+    """Кодує сторінку відповідно до профілю.
+
+    Повертає (байти зображення, тип сторінки, назва кодека).
+    """
+    profile_codecs = EXPORT_PROFILES[profile]
+    page_kind, gray = classify_page(img, profile_codecs["exact"], force_color)
+    codec = profile_codecs[page_kind]
+
+    # PNG - лише проміжний контейнер: PyMuPDF розпаковує його і стискає растр
+    # заново при збереженні PDF, тому тут достатньо найшвидшого рівня стиснення
+    buffer = io.BytesIO()
+    if codec == "bilevel":
+        # 1-бітний растр; MuPDF стискає його в PDF як CCITT G4 (CCITTFaxDecode)
+        Image.fromarray(gray >= BILEVEL_THRESHOLD).save(buffer, format="PNG", compress_level=1)
+    elif codec == "gray":
+        Image.fromarray(gray).save(buffer, format="PNG", compress_level=1)
+    elif codec == "jpeg":
+        source = Image.fromarray(gray) if gray is not None else img.convert("RGB")
+        source.save(buffer, format="JPEG", quality=profile_codecs["jpeg_quality"], optimize=True)
+    else:
+        img.convert("RGB").save(buffer, format="PNG", compress_level=1)
+
+    return buffer.getvalue(), page_kind, codec
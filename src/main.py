@@ -1,39 +1,21 @@
 import csv
+import hashlib
 import json
 import math
-import tempfile
+import time
 import tkinter as tk
 from tkinter import messagebox, simpledialog
-from tkinter.colorchooser import askcolor
-import fitz  # PyMuPDF
-from PIL import Image, ImageTk, ImageFont, ImageDraw
 import os
 import settings
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-RAW_PDF_FOLDER = os.path.join(BASE_DIR, "raw")
-
-EDITED_PDF_FOLDER = os.path.join(BASE_DIR, "edited")
-
-CSV_FOLDER = os.path.join(BASE_DIR, "output")
-
-CSV_FILENAME = "document_changes.csv"
-
-CSV_FILE_PATH = os.path.join(CSV_FOLDER, CSV_FILENAME)
-
-FONT_PATH = os.path.join(BASE_DIR, "fonts/Helvetica-Bold.ttf")
+from tiles import TileCache, rasterize_page, render_tile, visible_tiles
 
+# Важкі бібліотеки (PyMuPDF, PIL, NumPy) імпортуються лише в методах, яким вони потрібні,
+# щоб імпорт модуля та запуск без GUI не платили за них
 
 
 class PDFEditorApp:
     def __init__(self, root):
-        os.makedirs(RAW_PDF_FOLDER, exist_ok=True)
-        os.makedirs(EDITED_PDF_FOLDER, exist_ok=True)
-        os.makedirs(CSV_FOLDER, exist_ok=True)
+        settings.ensure_directories()
         self.root = root
         self.root.title("PDF Editor")
         self.pdf_document = None
@@ -43,6 +25,12 @@ class PDFEditorApp:
         self.mode = None  # 'text' для додавання тексту, 'image' для додавання зображення, 'edit' для редагування тексту
         self.text_items_by_page = {}  # Зберігає текстові елементи по сторінках
         self.current_text_item = None  # Текущий текстовий елемент для переміщення
+        self.zoom_index = 0  # Індекс у settings.ZOOM_LEVELS
+        self.page_sources = []  # Номер сторінки PDF для кожної відображуваної сторінки
+        self.tile_cache = TileCache(settings.TILE_CACHE_SIZE)
+        self.tile_items = {}  # (стовпець, рядок) -> (id на canvas, PhotoImage) для показаних тайлів
+        self.pending_tiles = []  # Тайли, що чекають на рендеринг
+        self.tile_job = None
 
         self.root.state('zoomed')  # Вікно на весь екран
 
@@ -51,7 +39,7 @@ class PDFEditorApp:
         self.open_next_pdf()  # Тепер викликаємо self.open_next_pdf()
 
     def load_pdf_files(self):
-        folder_path = RAW_PDF_FOLDER
+        folder_path = settings.RAW_PDF_FOLDER
         self.pdf_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.pdf')]
         if not self.pdf_files:
             messagebox.showwarning("No PDFs", "No PDF files found in the specified folder.")
@@ -102,6 +90,12 @@ class PDFEditorApp:
         self.skip_pdf_button = tk.Button(frame, text="Skip PDF", command=self.skip_pdf, state=tk.NORMAL)
         self.skip_pdf_button.pack(side=tk.LEFT, padx=5, pady=5)
 
+        self.zoom_in_button = tk.Button(frame, text="Zoom In", command=self.zoom_in, state=tk.NORMAL)
+        self.zoom_in_button.pack(side=tk.LEFT, padx=5, pady=5)
+
+        self.zoom_out_button = tk.Button(frame, text="Zoom Out", command=self.zoom_out, state=tk.NORMAL)
+        self.zoom_out_button.pack(side=tk.LEFT, padx=5, pady=5)
+
         # Створюємо canvas для відображення PDF
         self.canvas = tk.Canvas(self.root, bg="gray")
         self.canvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
@@ -111,6 +105,8 @@ class PDFEditorApp:
         self.canvas.bind("<Button-1>", self.on_canvas_click)
         self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
         self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Shift-MouseWheel>", self.on_shift_mouse_wheel)
+        self.canvas.bind("<Control-MouseWheel>", self.on_control_mouse_wheel)
         self.canvas.bind("<Button-3>", self.on_canvas_right_click)
 
         # Додаємо лейбл для відображення номеру сторінки
@@ -160,7 +156,7 @@ class PDFEditorApp:
     
     def find_last_processed_pdf(self):
         """Знаходить останній оброблений PDF в local_records.csv і повертає його індекс"""
-        record_file = 'local_records.csv'
+        record_file = settings.LOCAL_RECORDS_PATH
 
         # Перевіряємо, чи існує файл з записами
         if not os.path.exists(record_file):
@@ -188,7 +184,7 @@ class PDFEditorApp:
 
     def local_records(self, status):
         """Оновлює або додає записи до local_records.csv для поточного PDF"""
-        record_file = os.path.join(BASE_DIR, 'local_records.csv')
+        record_file = settings.LOCAL_RECORDS_PATH
         records = []
 
         # Отримуємо назву поточного PDF файлу
@@ -218,15 +214,16 @@ class PDFEditorApp:
             writer.writerows(records)
 
     def open_pdf(self, file_path):
+        import fitz  # PyMuPDF
+
         self.pdf_document = fitz.open(file_path)
         self.pages_as_images = []  # Store pages as images
+        self.page_sources = list(range(len(self.pdf_document)))
+        self.tile_cache.clear()
 
-        # Extract each page as an image
+        # Extract each page as an image (у роздільності джерела, без згладжування)
         for i in range(len(self.pdf_document)):
-            page = self.pdf_document[i]
-            pix = page.get_pixmap()
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            self.pages_as_images.append(img)
+            self.pages_as_images.append(rasterize_page(self.pdf_document[i]))
         
         self.current_page = 0
         self.display_page()
@@ -250,8 +247,8 @@ class PDFEditorApp:
         canvas_y = self.canvas.canvasy(event.y)
 
         # Масштабуємо координати для відповідності розміру зображення
-        img_x = int(canvas_x / self.scale_ratio)
-        img_y = int(canvas_y / self.scale_ratio)
+        img_x = int(canvas_x / (self.scale_ratio * self.zoom))
+        img_y = int(canvas_y / (self.scale_ratio * self.zoom))
 
         # Отримуємо зображення сторінки
         img = self.pages_as_images[self.current_page]
@@ -274,22 +271,27 @@ class PDFEditorApp:
                 self.canvas.unbind("<Button-1>")  # Вимикаємо режим піпетки
                 self.canvas.bind("<Button-1>", self.on_canvas_click)
 
+    @property
+    def zoom(self):
+        return settings.ZOOM_LEVELS[self.zoom_index]
+
     def display_page(self):
         # Очищення старого вмісту canvas
         self.canvas.delete("all")
+        self.tile_items.clear()
+        self.pending_tiles.clear()
 
         img = self.pages_as_images[self.current_page]
 
-        # Масштабування зображення для підходу до canvas
+        # Масштаб 1.0 відповідає ширині canvas; текстові елементи зберігають координати саме в ньому
         canvas_width = self.canvas.winfo_width()
         self.scale_ratio = canvas_width / img.width  # Зберігаємо коефіцієнт масштабування
-        new_width = int(img.width * self.scale_ratio)
-        new_height = int(img.height * self.scale_ratio)
-        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        self.view_width = math.ceil(img.width * self.scale_ratio * self.zoom)
+        self.view_height = math.ceil(img.height * self.scale_ratio * self.zoom)
+        self.canvas.config(scrollregion=(0, 0, self.view_width, self.view_height))
 
-        self.img_tk = ImageTk.PhotoImage(img)
-        self.canvas.create_image(0, 0, image=self.img_tk, anchor=tk.NW)
-        self.canvas.config(scrollregion=self.canvas.bbox(tk.ALL))
+        # Сторінка малюється тайлами: рендеряться лише видимі частини
+        self.render_visible_tiles()
 
         # Перемальовування всіх текстових елементів та фону для поточної сторінки
         if self.current_page in self.text_items_by_page:
@@ -297,13 +299,101 @@ class PDFEditorApp:
                 # Перемальовування тексту
                 self.add_text_with_background(text_info, redraw=True)
 
-        self.page_info_label.config(text=f"Page {self.current_page + 1} of {len(self.pages_as_images)}")
+        self.page_info_label.config(
+            text=f"Page {self.current_page + 1} of {len(self.pages_as_images)} ({int(self.zoom * 100)}%)"
+        )
 
         # Діагностичний вивід для перевірки значення current_text_item
         if self.current_text_item:
             print(f"Current text item: {self.current_text_item}")
 
 
+    def tile_scale(self):
+        """Масштаб рендерингу поточної сторінки PDF у пікселях на пункт."""
+        img = self.pages_as_images[self.current_page]
+        page = self.pdf_document[self.page_sources[self.current_page]]
+        return self.scale_ratio * self.zoom * img.width / page.rect.width
+
+    def render_visible_tiles(self):
+        """Показує тайли з кешу і ставить у чергу ті, яких ще немає.
+
+        Тайли поза видимою областю прибираються з canvas, але лишаються в кеші.
+        """
+        left = self.canvas.canvasx(0)
+        top = self.canvas.canvasy(0)
+        right = left + self.canvas.winfo_width()
+        bottom = top + self.canvas.winfo_height()
+        tiles = visible_tiles(left, top, right, bottom, self.view_width, self.view_height, settings.TILE_SIZE)
+
+        for tile in list(self.tile_items):
+            if tile not in tiles:
+                item_id, _ = self.tile_items.pop(tile)
+                self.canvas.delete(item_id)
+
+        source_page = self.page_sources[self.current_page]
+        scale = round(self.tile_scale(), 6)
+        self.pending_tiles = []
+        for column, row in tiles:
+            if (column, row) in self.tile_items:
+                continue
+            photo = self.tile_cache.get((source_page, scale, column, row))
+            if photo is not None:
+                self.show_tile(column, row, photo)
+            else:
+                self.pending_tiles.append((column, row))
+
+        if self.pending_tiles and self.tile_job is None:
+            self.tile_job = self.root.after_idle(self.load_next_tile)
+
+    def load_next_tile(self):
+        """Рендерить один тайл із черги і планує наступний, щоб інтерфейс не зависав."""
+        from PIL import ImageTk
+
+        self.tile_job = None
+        if not self.pending_tiles:
+            return
+
+        column, row = self.pending_tiles.pop(0)
+        source_page = self.page_sources[self.current_page]
+        scale = round(self.tile_scale(), 6)
+        key = (source_page, scale, column, row)
+        photo = self.tile_cache.get(key)
+        if photo is None:
+            tile = render_tile(self.pdf_document[source_page], scale, column, row, settings.TILE_SIZE)
+            photo = ImageTk.PhotoImage(tile)
+            self.tile_cache.put(key, photo)
+        self.show_tile(column, row, photo)
+
+        if self.pending_tiles:
+            self.tile_job = self.root.after(1, self.load_next_tile)
+
+    def show_tile(self, column, row, photo):
+        item_id = self.canvas.create_image(
+            column * settings.TILE_SIZE, row * settings.TILE_SIZE, image=photo, anchor=tk.NW, tags="tile"
+        )
+        # Тайли завжди під текстовими елементами
+        self.canvas.tag_lower(item_id)
+        self.tile_items[(column, row)] = (item_id, photo)
+
+    def set_zoom(self, zoom_index):
+        """Змінює масштаб, зберігаючи положення видимої області на сторінці."""
+        zoom_index = max(0, min(len(settings.ZOOM_LEVELS) - 1, zoom_index))
+        if zoom_index == self.zoom_index or not self.pages_as_images:
+            return
+        x_fraction = self.canvas.xview()[0]
+        y_fraction = self.canvas.yview()[0]
+        self.zoom_index = zoom_index
+        self.display_page()
+        self.canvas.xview_moveto(x_fraction)
+        self.canvas.yview_moveto(y_fraction)
+        self.render_visible_tiles()
+
+    def zoom_in(self):
+        self.set_zoom(self.zoom_index + 1)
+
+    def zoom_out(self):
+        self.set_zoom(self.zoom_index - 1)
+
     def on_resize(self, event):
         """Обробка зміни розміру вікна для перерисовки сторінки."""
         self.display_page()
@@ -316,13 +406,14 @@ class PDFEditorApp:
 
     def on_canvas_drag(self, event):
         if self.current_text_item and not self.current_text_item.get("readonly", False):
-            # Отримуємо реальні координати з урахуванням прокрутки
-            x = self.canvas.canvasx(event.x)
-            y = self.canvas.canvasy(event.y)
+            # Отримуємо реальні координати з урахуванням прокрутки і масштабу
+            x = self.canvas.canvasx(event.x) / self.zoom
+            y = self.canvas.canvasy(event.y) / self.zoom
 
-            # Оновлюємо координати об'єкта текстового елементу
+            # Оновлюємо координати об'єкта текстового елементу і масштаб, у якому їх задано
             self.current_text_item["x"] = x
             self.current_text_item["y"] = y
+            self.current_text_item["scale_ratio"] = self.scale_ratio
 
             # Використовуємо попередні кольори для перемальовування
             text_color = self.current_text_item.get("text_color", "black")
@@ -336,10 +427,10 @@ class PDFEditorApp:
 
             # Перемальовуємо текст
             text_id = self.canvas.create_text(
-                x,
-                y,
+                x * self.zoom,
+                y * self.zoom,
                 text=self.current_text_item["text"],
-                font=("ArialNarrow", self.current_text_item["font_size"]),
+                font=("ArialNarrow", round(self.current_text_item["font_size"] * self.zoom)),
                 anchor="nw",
                 fill=text_color,
             )
@@ -384,8 +475,8 @@ class PDFEditorApp:
 
     def on_canvas_right_click(self, event):
         # Отримуємо координати кліка
-        click_x = self.canvas.canvasx(event.x)
-        click_y = self.canvas.canvasy(event.y)
+        click_x = self.canvas.canvasx(event.x) / self.zoom
+        click_y = self.canvas.canvasy(event.y) / self.zoom
 
         # Знаходимо найближчий текстовий елемент вручну
         closest_item = min(
@@ -413,12 +504,12 @@ class PDFEditorApp:
             if text_info.get("rect_id") is not None:
                 self.canvas.delete(text_info["rect_id"])
         
-        # Створюємо текстовий елемент
+        # Створюємо текстовий елемент (координати зберігаються для масштабу 1.0)
         text_id = self.canvas.create_text(
-            text_info["x"],
-            text_info["y"],
+            text_info["x"] * self.zoom,
+            text_info["y"] * self.zoom,
             text=text_info["text"],
-            font=("ArialNarrow", text_info["font_size"]),
+            font=("ArialNarrow", round(text_info["font_size"] * self.zoom)),
             anchor="nw",
             fill=text_color,
         )
@@ -452,8 +543,8 @@ class PDFEditorApp:
         """Додає текст на обрану позицію, якщо сторінка не є дубльованою."""
         # Перевірка, чи сторінка не є дубльованою
         if not self.text_items_by_page.get(self.current_page, []) or not self.text_items_by_page.get(self.current_page, [])[0].get("readonly", False):
-            canvas_x = self.canvas.canvasx(x)
-            canvas_y = self.canvas.canvasy(y)
+            canvas_x = self.canvas.canvasx(x) / self.zoom
+            canvas_y = self.canvas.canvasy(y) / self.zoom
             
             # Відкриваємо діалог для введення тексту, якщо текст не передано як параметр
             if not text:
@@ -472,6 +563,8 @@ class PDFEditorApp:
                     "x": canvas_x,
                     "y": canvas_y,
                     "font_size": 12,
+                    # Масштаб canvas у момент розміщення: за ним verify.py відновлює рамки тексту
+                    "scale_ratio": self.scale_ratio,
                     "id": None,
                     "rect_id": None
                 }
@@ -495,9 +588,6 @@ class PDFEditorApp:
                 # Додаємо оновлений текст з фоном
                 self.add_text_with_background(self.current_text_item, redraw=True)
 
-                # Оновлюємо область прокрутки
-                self.canvas.config(scrollregion=self.canvas.bbox(tk.ALL))
-                
     def delete_selected_text(self):
             """Видаляє вибраний текстовий елемент після підтвердження."""
             if self.current_text_item:
@@ -515,15 +605,25 @@ class PDFEditorApp:
                     # Очищаємо вибраний текстовий елемент
                     self.current_text_item = None
 
-                    # Оновлюємо область прокрутки
-                    self.canvas.config(scrollregion=self.canvas.bbox(tk.ALL))
                     self.edit_text_button.config(state=tk.DISABLED)
                     self.delete_text_button.config(state=tk.DISABLED)
 
     def on_mouse_wheel(self, event):
         """Обробляємо вертикальну прокрутку за допомогою коліщатка миші."""
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        self.canvas.config(scrollregion=self.canvas.bbox(tk.ALL))  # Оновлюємо область прокрутки
+        self.render_visible_tiles()  # Підвантажуємо тайли, що стали видимими
+
+    def on_shift_mouse_wheel(self, event):
+        """Горизонтальна прокрутка (Shift + коліщатко) для збільшеної сторінки."""
+        self.canvas.xview_scroll(int(-1*(event.delta/120)), "units")
+        self.render_visible_tiles()
+
+    def on_control_mouse_wheel(self, event):
+        """Масштабування сторінки за допомогою Ctrl + коліщатко."""
+        if event.delta > 0:
+            self.zoom_in()
+        else:
+            self.zoom_out()
 
     def enable_text_mode(self):
         self.mode = "text"
@@ -601,6 +701,7 @@ class PDFEditorApp:
 
         # Вставляємо дубльовані сторінки і текст одразу після кінця діапазону
         self.pages_as_images[insert_index:insert_index] = duplicated_pages
+        self.page_sources[insert_index:insert_index] = self.page_sources[start - 1:end]
 
         # Вставляємо дубльовані текстові елементи
         for i, text_items in enumerate(duplicated_text_items):
@@ -622,6 +723,8 @@ class PDFEditorApp:
 
     def canvas_to_image(self):
         """Перетворює canvas в зображення."""
+        from PIL import Image
+
         # Зберігаємо canvas як тимчасовий EPS файл
         temp_eps_file = "temp_canvas.eps"
         self.canvas.postscript(file=temp_eps_file)
@@ -646,7 +749,7 @@ class PDFEditorApp:
         """Збереження PDF-файлу з високою якістю зображення та тонким шрифтом."""
         self.local_records(file_status)
         if self.pages_as_images:
-            folder_path = EDITED_PDF_FOLDER
+            folder_path = settings.EDITED_PDF_FOLDER
             original_file_name = os.path.basename(self.pdf_files[self.current_file_index - 1])
             new_file_name = f"{os.path.splitext(original_file_name)[0]}_edited.pdf"
             save_path = os.path.join(folder_path, new_file_name)
@@ -655,7 +758,7 @@ class PDFEditorApp:
                 os.makedirs(folder_path)
 
             # Створення або оновлення records.json
-            records_path = os.path.join(BASE_DIR, 'records.json')
+            records_path = settings.RECORDS_JSON_PATH
 
             # Перевіряємо, чи існує файл, і чи він не порожній
             if os.path.exists(records_path):
@@ -707,37 +810,160 @@ class PDFEditorApp:
                         'edited': cleaned_text_items
                     }
 
+            # Номер сторінки оригінального PDF для кожної сторінки результату (для перевірки дублікатів)
+            file_data[file_id]['page_sources'] = [source + 1 for source in self.page_sources]
+            file_data[file_id]['page_boxes'] = {}
 
-            # Зберігаємо JSON дані у файл
-            with open(records_path, 'w', encoding='utf-8') as json_file:
-                json.dump(file_data, json_file, ensure_ascii=False, indent=4)
+            # Шарди для навчання пишемо лише для остаточно оброблених файлів.
+            # Зразки збираються під час експорту і записуються лише після успішного збереження PDF
+            shard_samples = None
+            if settings.EXPORT_TRAINING_SHARDS and file_status == 'processed':
+                shard_samples = []
 
             # Збереження PDF-файлу
-            c = canvas.Canvas(save_path, pagesize=letter)
+            import fitz  # PyMuPDF
+            from compression import encode_page, is_gray_color
+            from shards import normalize_box
+
+            started_at = time.perf_counter()
+            encode_seconds = 0.0
+            page_kinds = {}
+            page_codecs = {}
+            pdf_document = fitz.open()
+            pdf_width, pdf_height = fitz.paper_size("letter")
+
+            # Однакові сторінки кодуємо один раз і посилаємось на той самий XObject;
+            # для кожного зображення зберігаємо (xref, тип сторінки, кодек)
+            image_xrefs_by_hash = {}
 
             for index, img in enumerate(self.pages_as_images):
-                img_with_text = self.merge_texts_with_image(index)
+                img_with_text, boxes = self.merge_texts_with_image(index, return_boxes=True)
+                if boxes:
+                    # Рамки накладеного тексту в пікселях зображення сторінки
+                    file_data[file_id]['page_boxes'][f'{index + 1}'] = [
+                        normalize_box(box, img_with_text.size) for box in boxes
+                    ]
+
+                if shard_samples is not None:
+                    source_page = self.page_sources[index]
+                    shard_samples.append((
+                        f"{file_id}_p{index + 1:04d}",
+                        img_with_text,
+                        boxes,
+                        {
+                            "file_id": file_id,
+                            "page": index + 1,
+                            "source_page": source_page + 1,
+                            # Дублікат - будь-яка сторінка, крім першої з того самого оригіналу
+                            "duplicated": self.page_sources.index(source_page) != index,
+                            "texts": [item["text"] for item in self.text_items_by_page.get(index, [])],
+                        },
+                    ))
 
-                pdf_width, pdf_height = letter
                 img_width, img_height = img_with_text.size
                 scale = min(pdf_width / img_width, pdf_height / img_height)
                 scaled_width = img_width * scale
                 scaled_height = img_height * scale
                 x_offset = (pdf_width - scaled_width) / 2
                 y_offset = (pdf_height - scaled_height) / 2
+                image_rect = fitz.Rect(x_offset, y_offset, x_offset + scaled_width, y_offset + scaled_height)
+
+                page = pdf_document.new_page(width=pdf_width, height=pdf_height)
+                image_hash = self.image_digest(img_with_text)
+                if image_hash not in image_xrefs_by_hash:
+                    # Кольоровий текст або фон не можна зводити до відтінків сірого
+                    force_color = any(
+                        not is_gray_color(text_info.get("text_color", getattr(self, 'text_color', 'black')))
+                        or not is_gray_color(text_info.get("text_background_color", getattr(self, 'text_background_color', 'white')))
+                        for text_info in self.text_items_by_page.get(index, [])
+                    )
+                    encode_started_at = time.perf_counter()
+                    image_data, page_kind, codec = encode_page(img_with_text, settings.EXPORT_PROFILE, force_color)
+                    encode_seconds += time.perf_counter() - encode_started_at
+                    image_xrefs_by_hash[image_hash] = (page.insert_image(image_rect, stream=image_data), page_kind, codec)
+                else:
+                    xref, page_kind, codec = image_xrefs_by_hash[image_hash]
+                    page.insert_image(image_rect, xref=xref)
+                page_kinds[page_kind] = page_kinds.get(page_kind, 0) + 1
+                page_codecs[codec] = page_codecs.get(codec, 0) + 1
+
+            pdf_document.save(save_path, garbage=3, deflate=True)
+            pdf_document.close()
 
-                with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_file:
-                    img_with_text.save(temp_file.name, format="PNG", optimize=True)
-                    temp_file_path = temp_file.name
+            # Зберігаємо JSON дані у файл
+            with open(records_path, 'w', encoding='utf-8') as json_file:
+                json.dump(file_data, json_file, ensure_ascii=False, indent=4)
 
-                c.drawImage(temp_file_path, x_offset, y_offset, width=scaled_width, height=scaled_height)
-                c.showPage()
+            if shard_samples is not None:
+                from shards import ShardWriter
+
+                with ShardWriter(settings.TRAINING_SHARDS_FOLDER, settings.SHARD_MAX_SAMPLES) as shard_writer:
+                    revision = shard_writer.write_document(file_id, shard_samples)
+                if revision > 1:
+                    print(f"Training samples for {file_id} written as revision {revision}; "
+                          f"earlier revisions are superseded (see {settings.TRAINING_SHARDS_FOLDER}/index.csv).")
+
+            self.write_export_report(
+                original_file_name,
+                len(self.pages_as_images),
+                len(image_xrefs_by_hash),
+                page_kinds,
+                page_codecs,
+                os.path.getsize(self.pdf_files[self.current_file_index - 1]),
+                os.path.getsize(save_path),
+                encode_seconds,
+                time.perf_counter() - started_at,
+            )
 
-            c.save()
             messagebox.showinfo("PDF Saved", f"PDF saved to {save_path}")
 
-    def merge_texts_with_image(self, page_index):
-        """Об'єднує всі текстові елементи з зображенням сторінки з обраними кольорами фону та тексту."""
+    def write_export_report(self, file_name, pages, unique_images, page_kinds, page_codecs, source_size, file_size,
+                            encode_seconds, total_seconds):
+        """Додає рядок зі статистикою розміру та часу експорту документа до export_report.csv.
+
+        Типи сторінок і кодеки рахуються для кожної сторінки, разом зі сторінками-дублікатами.
+        """
+        report_exists = os.path.exists(settings.EXPORT_REPORT_PATH)
+        with open(settings.EXPORT_REPORT_PATH, mode='a', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            if not report_exists:
+                writer.writerow([
+                    'file', 'profile', 'pages', 'unique_images', 'bilevel', 'grayscale', 'color', 'codecs',
+                    'source_size_bytes', 'size_bytes', 'encode_seconds', 'total_seconds',
+                ])
+            writer.writerow([
+                file_name,
+                settings.EXPORT_PROFILE,
+                pages,
+                unique_images,
+                page_kinds.get('bilevel', 0),
+                page_kinds.get('grayscale', 0),
+                page_kinds.get('color', 0),
+                # Наприклад "bilevel:18 jpeg:2"
+                " ".join(f"{codec}:{count}" for codec, count in sorted(page_codecs.items())),
+                source_size,
+                file_size,
+                f"{encode_seconds:.3f}",
+                f"{total_seconds:.3f}",
+            ])
+        print(f"Exported {file_name}: {pages} pages, {source_size} -> {file_size} bytes, "
+              f"encode {encode_seconds:.2f}s, total {total_seconds:.2f}s, {page_kinds}")
+
+    @staticmethod
+    def image_digest(img):
+        """Повертає хеш вмісту зображення (режим, розмір і пікселі)."""
+        digest = hashlib.sha1(f"{img.mode}:{img.width}x{img.height}".encode("ascii"))
+        digest.update(img.tobytes())
+        return digest.hexdigest()
+
+    def merge_texts_with_image(self, page_index, return_boxes=False):
+        """Об'єднує всі текстові елементи з зображенням сторінки з обраними кольорами фону та тексту.
+
+        Якщо return_boxes=True, додатково повертає рамки (з відступом) усіх накладених текстів
+        у координатах зображення сторінки.
+        """
+        from PIL import ImageDraw, ImageFont
+
         img = self.pages_as_images[page_index]
         img_with_text = img.copy()
         draw = ImageDraw.Draw(img_with_text)
@@ -745,6 +971,7 @@ class PDFEditorApp:
         canvas_width = self.canvas.winfo_width()
         scale_ratio = canvas_width / img.width
         padding = 1
+        boxes = []
 
         if page_index in self.text_items_by_page:
             for text_info in self.text_items_by_page[page_index]:
@@ -752,7 +979,7 @@ class PDFEditorApp:
                 scaled_y = (text_info["y"]) / scale_ratio + 1
                 scaled_font_size = math.ceil(text_info["font_size"] / scale_ratio) + 2
 
-                font = ImageFont.truetype(FONT_PATH, scaled_font_size)
+                font = ImageFont.truetype(settings.FONT_PATH, scaled_font_size)
 
                 # Отримуємо розмір тексту для прямокутника
                 text_bbox = draw.textbbox((scaled_x, scaled_y), text_info["text"], font=font)
@@ -769,7 +996,10 @@ class PDFEditorApp:
 
                 draw.rectangle(text_bbox_with_padding, fill=text_background_color)
                 draw.text((scaled_x, scaled_y), text_info["text"], fill=text_color, font=font)
+                boxes.append(text_bbox_with_padding)
 
+        if return_boxes:
+            return img_with_text, boxes
         return img_with_text
 
 
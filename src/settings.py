@@ -14,6 +14,34 @@ CSV_FILE_PATH = os.path.join(CSV_FOLDER, CSV_FILENAME)
 
 FONT_PATH = os.path.join(BASE_DIR, "fonts/Helvetica-Bold.ttf")
 
-os.makedirs(RAW_PDF_FOLDER, exist_ok=True)
-os.makedirs(EDITED_PDF_FOLDER, exist_ok=True)
-os.makedirs(CSV_FOLDER, exist_ok=True)
+RECORDS_JSON_PATH = os.path.join(BASE_DIR, "records.json")
+
+LOCAL_RECORDS_PATH = os.path.join(BASE_DIR, "local_records.csv")
+
+TRAINING_SHARDS_FOLDER = os.path.join(BASE_DIR, "shards")
+
+EXPORT_TRAINING_SHARDS = False
+
+SHARD_MAX_SAMPLES = 1000
+
+# Профіль стиснення сторінок при експорті: lossless, balanced, compact або rgb.
+# За замовчуванням - без втрат: набір даних для виявлення підробок не повинен
+# втрачати дрібних кольорових позначок; balanced і compact вмикаються свідомо
+EXPORT_PROFILE = "lossless"
+
+EXPORT_REPORT_PATH = os.path.join(CSV_FOLDER, "export_report.csv")
+
+# Рівні масштабу відносно ширини вікна
+ZOOM_LEVELS = (1.0, 1.5, 2.0, 3.0, 4.0)
+
+# Розмір тайла (у пікселях екрана) і кількість тайлів у кеші
+TILE_SIZE = 512
+
+TILE_CACHE_SIZE = 64
+
+
+def ensure_directories():
+    """Створює робочі папки. Викликається під час запуску, а не при імпорті модуля."""
+    os.makedirs(RAW_PDF_FOLDER, exist_ok=True)
+    os.makedirs(EDITED_PDF_FOLDER, exist_ok=True)
+    os.makedirs(CSV_FOLDER, exist_ok=True)
@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import os
+import tarfile
+
+from PIL import Image, ImageDraw
+
+
+SHARD_NAME_TEMPLATE = "shard-{:06d}.tar"
+
+# Список документів, записаних у шарди: документ, ревізія, перший і останній шард, кількість зразків
+INDEX_FILENAME = "index.csv"
+
+
+def read_index(folder):
+    """Повертає останню ревізію кожного документа з index.csv.
+
+    Результат - {document_id: {"revision", "first_shard", "last_shard", "samples"}}.
+    Зразки попередніх ревізій лишаються в шардах, тому читач має пропускати зразки,
+    у яких "revision" не збігається з ревізією документа в індексі.
+    """
+    documents = {}
+    index_path = os.path.join(folder, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return documents
+    with open(index_path, mode='r', newline='', encoding='utf-8') as file:
+        for record in csv.reader(file):
+            if not record:
+                continue
+            if len(record) == 2:
+                # Старий формат: документ і шард, у який його записано
+                document_id, shard_name = record
+                entry = {"revision": 1, "first_shard": shard_name, "last_shard": shard_name, "samples": None}
+            else:
+                document_id, revision, first_shard, last_shard, samples = record
+                entry = {"revision": int(revision), "first_shard": first_shard, "last_shard": last_shard, "samples": int(samples)}
+            if document_id not in documents or entry["revision"] > documents[document_id]["revision"]:
+                documents[document_id] = entry
+    return documents
+
+
+def normalize_box(box, size):
+    """Перетворює рамку ImageDraw.rectangle у цілі пікселі [x0, y0, x1, y1) з виключною правою/нижньою межею.
+
+    ImageDraw відкидає дробову частину координат і зафарбовує пікселі x0..x1 включно,
+    тому результат покриває рівно ті пікселі, які було зафарбовано. Рамка обрізається межами зображення.
+    """
+    width, height = size
+    x0 = max(0, int(box[0]))
+    y0 = max(0, int(box[1]))
+    x1 = min(width, int(box[2]) + 1)
+    y1 = min(height, int(box[3]) + 1)
+    return [x0, y0, x1, y1]
+
+
+def build_mask(size, boxes):
+    """Створює бінарну маску підмінених областей (1 - змінений піксель)."""
+    mask = Image.new("1", size, 0)
+    draw = ImageDraw.Draw(mask)
+    for x0, y0, x1, y1 in boxes:
+        if x1 > x0 and y1 > y0:
+            # ImageDraw включає праву і нижню межу, тому віднімаємо 1
+            draw.rectangle((x0, y0, x1 - 1, y1 - 1), fill=1)
+    return mask
+
+
+class ShardWriter:
+    """Записує готові сторінки з масками у послідовні tar-шарди.
+
+    Кожен зразок - це три файли зі спільним ключем (як у WebDataset):
+    ``<key>.png`` - сторінка, ``<key>.mask.png`` - бінарна маска,
+    ``<key>.json`` - рамки та метадані. Коли шард містить ``max_samples``
+    зразків, починається наступний, тому архіви можна читати потоково.
+    Записані документи перелічені в ``index.csv``. Повторний експорт документа
+    записується як нова ревізія (ключі з суфіксом ``_r<ревізія>``), яка заміщує
+    попередні - див. read_index.
+    """
+
+    def __init__(self, folder, max_samples):
+        self.folder = folder
+        self.max_samples = max_samples
+        self.tar = None
+        self.shard_index = 0
+        self.samples_in_shard = 0
+        self.documents = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        """Продовжує останній незаповнений шард або починає новий."""
+        os.makedirs(self.folder, exist_ok=True)
+        self.documents = {document_id: entry["revision"] for document_id, entry in read_index(self.folder).items()}
+
+        existing = sorted(f for f in os.listdir(self.folder) if f.startswith("shard-") and f.endswith(".tar"))
+        if existing:
+            last_name = existing[-1]
+            self.shard_index = int(last_name[len("shard-"):-len(".tar")])
+            with tarfile.open(os.path.join(self.folder, last_name), "r") as tar:
+                self.samples_in_shard = sum(1 for name in tar.getnames() if name.endswith(".json"))
+            if self.samples_in_shard < self.max_samples:
+                self.tar = tarfile.open(os.path.join(self.folder, last_name), "a")
+                return
+            self.shard_index += 1
+        self._start_shard()
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.tar = None
+
+    def _start_shard(self):
+        self.close()
+        path = os.path.join(self.folder, SHARD_NAME_TEMPLATE.format(self.shard_index))
+        self.tar = tarfile.open(path, "w")
+        self.samples_in_shard = 0
+
+    def _add_bytes(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self.tar.addfile(info, io.BytesIO(data))
+
+    def write(self, key, image, boxes, meta=None):
+        """Додає сторінку, її маску та рамки як один зразок."""
+        if self.tar is None:
+            self.open()
+        if self.samples_in_shard >= self.max_samples:
+            self.shard_index += 1
+            self._start_shard()
+
+        image_boxes = [normalize_box(box, image.size) for box in boxes]
+
+        image_buffer = io.BytesIO()
+        image.save(image_buffer, format="PNG")
+        mask_buffer = io.BytesIO()
+        build_mask(image.size, image_boxes).save(mask_buffer, format="PNG")
+
+        annotation = dict(meta or {})
+        annotation.update({
+            "width": image.width,
+            "height": image.height,
+            "boxes": image_boxes,
+        })
+
+        self._add_bytes(f"{key}.png", image_buffer.getvalue())
+        self._add_bytes(f"{key}.mask.png", mask_buffer.getvalue())
+        self._add_bytes(f"{key}.json", json.dumps(annotation, ensure_ascii=False).encode("utf-8"))
+        self.samples_in_shard += 1
+
+    def write_document(self, document_id, samples):
+        """Записує всі сторінки документа; samples - список (key, image, boxes, meta).
+
+        Якщо документ уже є в шардах, записується наступна ревізія. Повертає номер записаної ревізії.
+        """
+        if self.tar is None:
+            self.open()
+        revision = self.documents.get(document_id, 0) + 1
+
+        first_shard = None
+        for key, image, boxes, meta in samples:
+            self.write(f"{key}_r{revision}", image, boxes, {**(meta or {}), "document_id": document_id, "revision": revision})
+            if first_shard is None:
+                first_shard = self.shard_index
+        if first_shard is None:
+            first_shard = self.shard_index
+
+        with open(os.path.join(self.folder, INDEX_FILENAME), mode='a', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerow([
+                document_id,
+                revision,
+                SHARD_NAME_TEMPLATE.format(first_shard),
+                SHARD_NAME_TEMPLATE.format(self.shard_index),
+                len(samples),
+            ])
+        self.documents[document_id] = revision
+        return revision
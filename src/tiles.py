@@ -0,0 +1,129 @@
+import math
+from collections import OrderedDict
+
+
+# Найбільший масштаб (пікселів на пункт) для растеризації сторінки в роздільності джерела;
+# 4.0 відповідає 288 dpi
+MAX_SOURCE_SCALE = 4.0
+
+
+class TileCache:
+    """LRU-кеш відрендерених тайлів сторінок.
+
+    Ключ - (сторінка PDF, масштаб, стовпець, рядок). Коли кеш переповнюється,
+    видаляється тайл, до якого найдовше не зверталися.
+    """
+
+    def __init__(self, max_tiles):
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+
+    def clear(self):
+        self.tiles.clear()
+
+
+def tile_grid(page_width, page_height, tile_size):
+    """Кількість стовпців і рядків тайлів для сторінки заданого розміру (у пікселях)."""
+    return math.ceil(page_width / tile_size), math.ceil(page_height / tile_size)
+
+
+def visible_tiles(left, top, right, bottom, page_width, page_height, tile_size):
+    """Повертає (стовпець, рядок) тайлів, що перетинають видиму область canvas.
+
+    Тайли відсортовані рядками зверху вниз, щоб сторінка з'являлася поступово.
+    """
+    columns, rows = tile_grid(page_width, page_height, tile_size)
+    first_column = max(0, int(left // tile_size))
+    last_column = min(columns - 1, int(right // tile_size))
+    first_row = max(0, int(top // tile_size))
+    last_row = min(rows - 1, int(bottom // tile_size))
+    return [
+        (column, row)
+        for row in range(first_row, last_row + 1)
+        for column in range(first_column, last_column + 1)
+    ]
+
+
+def render_tile(page, scale, column, row, tile_size):
+    """Рендерить один тайл сторінки PyMuPDF з масштабом scale (пікселів на пункт).
+
+    Рендериться лише область тайла (clip), тому пам'ять не залежить від масштабу сторінки.
+    """
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    clip = fitz.Rect(
+        column * tile_size,
+        row * tile_size,
+        (column + 1) * tile_size,
+        (row + 1) * tile_size,
+    ) / scale
+    clip &= page.rect
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), clip=clip)
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def source_scale(page):
+    """Масштаб (пікселів на пункт), за якого основне зображення сторінки не перемасштабовується.
+
+    Основне - зображення, що займає найбільшу площу сторінки (скан), а не дрібні
+    вставки високої роздільності. Для сторінок без зображень - 1.0 (72 dpi).
+    Результат обмежено діапазоном від 1.0 до MAX_SOURCE_SCALE.
+    """
+    scale = 1.0
+    largest_area = 0.0
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        area = (x1 - x0) * (y1 - y0)
+        if x1 - x0 > 0 and y1 - y0 > 0 and area > largest_area:
+            largest_area = area
+            scale = max(info["width"] / (x1 - x0), info["height"] / (y1 - y0))
+    return min(max(scale, 1.0), MAX_SOURCE_SCALE)
+
+
+def rasterize_page(page):
+    """Растеризує сторінку в роздільності джерела і без згладжування.
+
+    MuPDF інтерполює зображення навіть без згладжування (наприклад, факс 204x196 dpi
+    розтягується по вертикалі), тому сторінка, усі зображення якої 1-бітні (CCITT, JBIG2),
+    повертається до чорного і білого порогом. Так бінарні скани при експорті знову
+    зберігаються як 1-бітні зображення.
+    """
+    import fitz  # PyMuPDF
+    import numpy as np
+    from PIL import Image
+    from compression import BILEVEL_THRESHOLD
+
+    scale = source_scale(page)
+    aa_level = fitz.TOOLS.show_aa_level()["graphics"]
+    fitz.TOOLS.set_aa_level(0)
+    try:
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
+    finally:
+        fitz.TOOLS.set_aa_level(aa_level)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+    images = page.get_images(full=True)
+    if images and all(image[4] == 1 for image in images):
+        pixels = np.asarray(img)
+        if not np.any(pixels.max(axis=2) - pixels.min(axis=2)):
+            img = Image.fromarray(np.where(pixels >= BILEVEL_THRESHOLD, 255, 0).astype(np.uint8))
+    return img
@@ -0,0 +1,360 @@
+"""Перевіряє відредаговані PDF з папки edited/ на відповідність records.json.
+
+Для кожного документа рендеряться сторінки оригінального PDF і читаються зображення
+сторінок відредагованого, рахується маска відмінностей (NumPy) і перевіряється,
+що зображення правильно розміщене на сторінці, змінені області лежать
+у рамках тексту (з допуском), а дубльовані сторінки збігаються зі своїм
+оригіналом. Рамки відновлюються з текстових елементів records.json (координати,
+розмір шрифту і масштаб canvas у момент розміщення), а не беруться з експорту.
+Документи перевіряються паралельно в пулі процесів.
+
+Запуск:  python verify.py [--workers N] [--tolerance PX] [--threshold V] [file_id ...]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import settings
+
+
+# Мінімальна різниця яскравості, з якої піксель вважається зміненим
+PIXEL_THRESHOLD = 48
+
+# Відступ (у пікселях) навколо записаних рамок, у межах якого зміни очікувані
+BOX_TOLERANCE = 3
+
+# Скільки змінених пікселів поза рамками допускається на сторінці
+MAX_UNEXPECTED_PIXELS = 25
+
+# Шум JPEG розкиданий поодинокими пікселями: у блоці NOISE_BLOCK x NOISE_BLOCK
+# менше ніж NOISE_BLOCK_PIXELS змінених пікселів вважаються шумом стиснення
+NOISE_BLOCK = 8
+
+NOISE_BLOCK_PIXELS = 4
+
+# Частка змінених пікселів, з якої сторінка вважається зовсім іншою сторінкою
+PAGE_MISMATCH_SHARE = 0.3
+
+# Відступ фону навколо тексту, як у merge_texts_with_image
+TEXT_PADDING = 1
+
+REPORT_PATH = os.path.join(settings.CSV_FOLDER, "verification_report.json")
+
+
+def pixmap_to_gray(pix):
+    """Перетворює Pixmap PyMuPDF у масив відтінків сірого (висота x ширина, uint8).
+
+    Кольори усереднюються так само, як у compression.classify_page.
+    """
+    import fitz  # PyMuPDF
+    import numpy as np
+
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.n != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+    return pixels.mean(axis=2, dtype=np.float32).round().astype(np.uint8)
+
+
+def render_raw_page(page):
+    """Рендерить сторінку оригінального PDF так само, як open_pdf у редакторі."""
+    import numpy as np
+    from tiles import rasterize_page
+
+    return np.asarray(rasterize_page(page).convert("RGB")).mean(axis=2, dtype=np.float32).round().astype(np.uint8)
+
+
+def edited_page_image(document, page):
+    """Повертає растр зображення, вбудованого в сторінку відредагованого PDF, і його розташування.
+
+    Растр читається напряму з XObject, без повторного рендерингу, тому не містить
+    артефактів масштабування.
+    """
+    import fitz  # PyMuPDF
+
+    images = page.get_images()
+    if len(images) != 1:
+        return None, None
+    xref = images[0][0]
+    rects = page.get_image_rects(xref)
+    return pixmap_to_gray(fitz.Pixmap(document, xref)), rects[0] if rects else None
+
+
+def placement_error(page, rect, width, height):
+    """Перевіряє, що зображення вписане і відцентроване на сторінці, як у save_pdf."""
+    scale = min(page.rect.width / width, page.rect.height / height)
+    x_offset = (page.rect.width - width * scale) / 2
+    y_offset = (page.rect.height - height * scale) / 2
+    expected = (x_offset, y_offset, x_offset + width * scale, y_offset + height * scale)
+    if rect is None or max(abs(a - b) for a, b in zip(rect, expected)) > 0.5:
+        return {"kind": "image_placement", "detail": f"image drawn at {rect}, expected {expected}"}
+    return None
+
+
+def page_text_items(record, page_key):
+    """Текстові елементи сторінки з records.json: додані або скопійовані на дубльовану сторінку."""
+    original = record.get("original_pages", {}).get(page_key)
+    if original is not None:
+        return original.get("added", [])
+    return record.get("duplicated_pages", {}).get(page_key, {}).get("edited", [])
+
+
+def expected_text_boxes(items, size):
+    """Відновлює рамки накладеного тексту так само, як merge_texts_with_image.
+
+    Повертає рамки [x0, y0, x1, y1) у пікселях зображення сторінки і кількість
+    елементів без scale_ratio, для яких рамку відновити неможливо.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    from shards import normalize_box
+
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    boxes = []
+    unverifiable = 0
+    for item in items:
+        scale_ratio = item.get("scale_ratio")
+        if not scale_ratio:
+            unverifiable += 1
+            continue
+        font = ImageFont.truetype(settings.FONT_PATH, math.ceil(item["font_size"] / scale_ratio) + 2)
+        x0, y0, x1, y1 = draw.textbbox((item["x"] / scale_ratio, item["y"] / scale_ratio + 1), item["text"], font=font)
+        boxes.append(normalize_box((x0 - TEXT_PADDING, y0 - TEXT_PADDING, x1 + TEXT_PADDING, y1 + TEXT_PADDING), size))
+    return boxes, unverifiable
+
+
+def diff_mask(raw, edited, threshold):
+    """Маска пікселів, що відрізняються більше ніж на threshold."""
+    import numpy as np
+
+    return np.abs(raw.astype(np.int16) - edited.astype(np.int16)) > threshold
+
+
+def remove_sparse_noise(mask):
+    """Прибирає з маски блоки, у яких змінених пікселів менше за NOISE_BLOCK_PIXELS."""
+    import numpy as np
+
+    height, width = mask.shape
+    padded_height = -(-height // NOISE_BLOCK) * NOISE_BLOCK
+    padded_width = -(-width // NOISE_BLOCK) * NOISE_BLOCK
+    padded = np.zeros((padded_height, padded_width), dtype=bool)
+    padded[:height, :width] = mask
+
+    counts = padded.reshape(padded_height // NOISE_BLOCK, NOISE_BLOCK, padded_width // NOISE_BLOCK, NOISE_BLOCK).sum(axis=(1, 3))
+    dense = np.repeat(np.repeat(counts >= NOISE_BLOCK_PIXELS, NOISE_BLOCK, axis=0), NOISE_BLOCK, axis=1)
+    return mask & dense[:height, :width]
+
+
+def expected_mask(shape, boxes, tolerance):
+    """Маска областей, у яких зміни очікувані: записані рамки, розширені на tolerance."""
+    import numpy as np
+
+    height, width = shape
+    mask = np.zeros(shape, dtype=bool)
+    for x0, y0, x1, y1 in boxes:
+        mask[max(0, y0 - tolerance):min(height, y1 + tolerance), max(0, x0 - tolerance):min(width, x1 + tolerance)] = True
+    return mask
+
+
+def check_page(raw, edited, boxes, threshold, tolerance):
+    """Порівнює одну сторінку і повертає список знайдених помилок."""
+    import numpy as np
+
+    errors = []
+    changed = diff_mask(raw, edited, threshold)
+    changed_share = np.count_nonzero(changed) / changed.size
+    if changed_share > PAGE_MISMATCH_SHARE:
+        return [{"kind": "page_mismatch", "detail": f"{changed_share:.0%} of pixels differ from the source page"}]
+
+    unexpected = remove_sparse_noise(changed & ~expected_mask(changed.shape, boxes, tolerance))
+    unexpected_count = int(np.count_nonzero(unexpected))
+    if unexpected_count > MAX_UNEXPECTED_PIXELS:
+        rows = np.flatnonzero(unexpected.any(axis=1))
+        columns = np.flatnonzero(unexpected.any(axis=0))
+        errors.append({
+            "kind": "unexpected_changes",
+            "detail": f"{unexpected_count} changed pixels outside recorded boxes",
+            "bbox": [int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1],
+        })
+
+    for box in boxes:
+        x0, y0, x1, y1 = box
+        if not changed[y0:y1, x0:x1].any():
+            errors.append({"kind": "box_without_changes", "detail": "no pixel changes inside recorded box", "bbox": box})
+
+    return errors
+
+
+def verify_document(file_id, record, threshold=PIXEL_THRESHOLD, tolerance=BOX_TOLERANCE):
+    """Перевіряє один документ. Виконується в окремому процесі пулу."""
+    import fitz  # PyMuPDF
+    import numpy as np
+
+    result = {"file_id": file_id, "pages": 0, "errors": []}
+    raw_path = os.path.join(settings.RAW_PDF_FOLDER, f"{file_id}.pdf")
+    edited_path = os.path.join(settings.EDITED_PDF_FOLDER, f"{file_id}_edited.pdf")
+    for path in (raw_path, edited_path):
+        if not os.path.exists(path):
+            result["errors"].append({"kind": "missing_file", "detail": path})
+    if result["errors"]:
+        return result
+
+    with fitz.open(raw_path) as raw_document, fitz.open(edited_path) as edited_document:
+        # Старі записи не містять page_sources - тоді сторінки мають відповідати один до одного
+        page_sources = [source - 1 for source in record.get("page_sources", range(1, len(raw_document) + 1))]
+        if len(edited_document) != len(page_sources):
+            result["errors"].append({
+                "kind": "page_count_mismatch",
+                "detail": f"edited PDF has {len(edited_document)} pages, expected {len(page_sources)}",
+            })
+            return result
+
+        raw_pages = {}
+        edited_by_source = {}
+        for index, source in enumerate(page_sources):
+            page_key = f"{index + 1}"
+            if not 0 <= source < len(raw_document):
+                result["errors"].append({"page": index + 1, "kind": "invalid_source_page", "detail": f"source page {source + 1}"})
+                continue
+
+            if source not in raw_pages:
+                raw_pages[source] = render_raw_page(raw_document[source])
+            raw = raw_pages[source]
+
+            edited_page = edited_document[index]
+            edited, image_rect = edited_page_image(edited_document, edited_page)
+            if edited is None:
+                result["errors"].append({"page": index + 1, "kind": "unexpected_image_count", "detail": "expected exactly one page image"})
+                continue
+            if edited.shape != raw.shape:
+                result["errors"].append({
+                    "page": index + 1,
+                    "kind": "size_mismatch",
+                    "detail": f"page image is {edited.shape[1]}x{edited.shape[0]}, source page is {raw.shape[1]}x{raw.shape[0]}",
+                })
+                continue
+            placement = placement_error(edited_page, image_rect, raw.shape[1], raw.shape[0])
+            if placement:
+                result["errors"].append({"page": index + 1, **placement})
+
+            recorded_boxes = record.get("page_boxes", {}).get(page_key, [])
+            boxes, unverifiable = expected_text_boxes(page_text_items(record, page_key), (raw.shape[1], raw.shape[0]))
+            if unverifiable:
+                # Старі записи без scale_ratio: перевіряємо хоча б за рамками, записаними при експорті
+                result["errors"].append({
+                    "page": index + 1,
+                    "kind": "unverifiable_item",
+                    "detail": f"{unverifiable} text item(s) without scale_ratio, using boxes recorded at export",
+                })
+                boxes = recorded_boxes
+            elif sorted(boxes) != sorted(recorded_boxes):
+                # Текст намальовано не там, де його розмістили (наприклад, змінилась ширина вікна)
+                result["errors"].append({
+                    "page": index + 1,
+                    "kind": "box_shifted",
+                    "detail": f"text drawn at {recorded_boxes}, placed at {boxes}",
+                })
+
+            for error in check_page(raw, edited, boxes, threshold, tolerance):
+                result["errors"].append({"page": index + 1, **error})
+
+            # Дубльована сторінка має збігатися з уже зрендереною копією того самого оригіналу
+            if source in edited_by_source:
+                original_index, original_edited, original_boxes = edited_by_source[source]
+                if original_boxes == boxes:
+                    differs = np.count_nonzero(remove_sparse_noise(diff_mask(original_edited, edited, threshold)))
+                    if differs > MAX_UNEXPECTED_PIXELS:
+                        result["errors"].append({
+                            "page": index + 1,
+                            "kind": "duplicate_differs",
+                            "detail": f"{differs} pixels differ from duplicated page {original_index + 1}",
+                        })
+            else:
+                edited_by_source[source] = (index, edited, boxes)
+
+            result["pages"] += 1
+
+    return result
+
+
+def verify_all(records, workers=None, threshold=PIXEL_THRESHOLD, tolerance=BOX_TOLERANCE):
+    """Перевіряє всі документи з records паралельно і повертає список результатів."""
+    file_ids = sorted(records)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(verify_document, file_id, records[file_id], threshold, tolerance)
+            for file_id in file_ids
+        ]
+        for file_id, future in zip(file_ids, futures):
+            # Пошкоджений PDF не повинен зупиняти перевірку решти документів
+            try:
+                results.append(future.result())
+            except Exception as error:
+                results.append({
+                    "file_id": file_id,
+                    "pages": 0,
+                    "errors": [{"kind": "unreadable_file", "detail": f"{type(error).__name__}: {error}"}],
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file_ids", nargs="*", help="перевірити лише ці документи (за замовчуванням - усі)")
+    parser.add_argument("--workers", type=int, default=None, help="кількість процесів (за замовчуванням - кількість ядер)")
+    parser.add_argument("--threshold", type=int, default=PIXEL_THRESHOLD, help="поріг різниці яскравості пікселя")
+    parser.add_argument("--tolerance", type=int, default=BOX_TOLERANCE, help="допуск навколо рамок у пікселях")
+    parser.add_argument("--report", default=REPORT_PATH, help="куди записати JSON-звіт")
+    args = parser.parse_args()
+
+    try:
+        with open(settings.RECORDS_JSON_PATH, 'r', encoding='utf-8') as json_file:
+            records = json.load(json_file)
+    except FileNotFoundError:
+        sys.exit(f"{settings.RECORDS_JSON_PATH} not found: save at least one document in the editor first.")
+    except json.JSONDecodeError as error:
+        sys.exit(f"{settings.RECORDS_JSON_PATH} is not valid JSON: {error}")
+
+    unknown_results = []
+    if args.file_ids:
+        unknown_results = [
+            {"file_id": file_id, "pages": 0, "errors": [{"kind": "unknown_file_id", "detail": f"no entry in {settings.RECORDS_JSON_PATH}"}]}
+            for file_id in args.file_ids if file_id not in records
+        ]
+        records = {file_id: records[file_id] for file_id in args.file_ids if file_id in records}
+
+    results = unknown_results + verify_all(records, args.workers, args.threshold, args.tolerance)
+
+    failed = [result for result in results if result["errors"]]
+    for result in failed:
+        print(f"{result['file_id']}: {len(result['errors'])} error(s)")
+        for error in result["errors"]:
+            page = f"page {error['page']}: " if "page" in error else ""
+            print(f"    {page}{error['kind']} - {error['detail']}")
+
+    error_counts = {}
+    for result in failed:
+        for error in result["errors"]:
+            error_counts[error["kind"]] = error_counts.get(error["kind"], 0) + 1
+
+    summary = {
+        "documents": len(results),
+        "pages": sum(result["pages"] for result in results),
+        "failed_documents": len(failed),
+        "errors": error_counts,
+    }
+    print(f"\nChecked {summary['documents']} documents ({summary['pages']} pages): "
+          f"{summary['failed_documents']} with errors {error_counts}")
+
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, 'w', encoding='utf-8') as json_file:
+        json.dump({"summary": summary, "documents": results}, json_file, ensure_ascii=False, indent=4)
+    print(f"Report saved to {args.report}")
+
+
+if __name__ == "__main__":
+    main()